@@ -1,8 +1,17 @@
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import BotoCoreError, ClientError
 
+_CLIENT_CONFIG = Config(
+    max_pool_connections=32,
+    tcp_keepalive=True,
+    retries={"mode": "adaptive", "max_attempts": 6},
+)
+
 
 def _require_env(name: str) -> str:
     value = os.getenv(name)
@@ -18,26 +27,38 @@ def main() -> None:
     region = session.region_name or os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "us-east-1"
 
     try:
-        sts = session.client("sts", region_name=region)
-        ident = sts.get_caller_identity()
-        print("STS OK")
-        print(f"Account: {ident.get('Account')}")
-        print(f"Arn: {ident.get('Arn')}")
-    except (BotoCoreError, ClientError) as e:
+        sts = session.client("sts", region_name=region, config=_CLIENT_CONFIG)
+    except BotoCoreError as e:
         raise SystemExit(f"STS call failed: {e}") from e
 
     try:
-        s3 = session.client("s3", region_name=region)
-        s3.head_bucket(Bucket=bucket)
-        print("S3 OK")
-        print(f"Bucket: {bucket}")
-        print(f"Region: {region}")
-    except ClientError as e:
-        code = (e.response or {}).get("Error", {}).get("Code")
-        raise SystemExit(f"S3 head_bucket failed for {bucket} ({code}): {e}") from e
+        s3 = session.client("s3", region_name=region, config=_CLIENT_CONFIG)
     except BotoCoreError as e:
         raise SystemExit(f"S3 head_bucket failed for {bucket}: {e}") from e
 
+    # Both checks are independent round trips, so run them concurrently and
+    # report the results in order.
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        ident_future = pool.submit(sts.get_caller_identity)
+        head_future = pool.submit(s3.head_bucket, Bucket=bucket)
+
+        try:
+            ident = ident_future.result()
+            sys.stdout.write(f"STS OK\nAccount: {ident.get('Account')}\nArn: {ident.get('Arn')}\n")
+            sys.stdout.flush()
+        except (BotoCoreError, ClientError) as e:
+            raise SystemExit(f"STS call failed: {e}") from e
+
+        try:
+            head_future.result()
+            sys.stdout.write(f"S3 OK\nBucket: {bucket}\nRegion: {region}\n")
+            sys.stdout.flush()
+        except ClientError as e:
+            code = (e.response or {}).get("Error", {}).get("Code")
+            raise SystemExit(f"S3 head_bucket failed for {bucket} ({code}): {e}") from e
+        except BotoCoreError as e:
+            raise SystemExit(f"S3 head_bucket failed for {bucket}: {e}") from e
+
 
 if __name__ == "__main__":
     main()
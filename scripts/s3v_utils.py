@@ -0,0 +1,346 @@
+import functools
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import botocore.session
+import numpy as np
+import orjson
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from botocore.parsers import ResponseParserFactory, RestJSONParser
+
+_NOT_FOUND_CODES = {"NotFoundException", "ResourceNotFoundException", "NoSuchBucket"}
+
+# Outputs made only of JSON-native values (strings, floats, documents), so the
+# decoded body can be returned as-is instead of being walked shape by shape.
+_RAW_OUTPUT_SHAPES = {"QueryVectorsOutput"}
+
+_ARRAYS_CONTEXT_KEY = "s3v_numpy_arrays"
+_FRAGMENTS_CONTEXT_KEY = "s3v_vector_fragments"
+
+# put_vectors bodies above this size are written to a temp file on disk and
+# streamed from there. bulk_put's default max_bytes keeps batches just under
+# it, so this only applies when a caller passes a larger max_bytes.
+_BODY_FILE_THRESHOLD = 4 * 1024 * 1024
+_BODY_FILE_CONTEXT_KEY = "s3v_body_file"
+
+# Enough pooled connections for the bulk_put/bulk_delete worker threads, kept
+# alive between calls; adaptive retries back off on throttling (503/429).
+_CLIENT_CONFIG = Config(
+    max_pool_connections=32,
+    tcp_keepalive=True,
+    retries={"mode": "adaptive", "max_attempts": 6},
+)
+
+
+class _EncodedVectors(list):
+    """A put_vectors batch that also carries each vector's orjson-encoded JSON."""
+
+    def __init__(self, vectors, fragments) -> None:
+        super().__init__(vectors)
+        self.fragments = fragments
+
+
+def _stash_vector_arrays(params, context, **kwargs) -> None:
+    # Param validation only accepts lists, so swap each ndarray for a one-element
+    # placeholder and remember where it was; the arrays are spliced back into the
+    # JSON body right before the request is sent. Batches from bulk_put are
+    # already encoded, so only their fragments need to be kept.
+    arrays = {}
+    query = params.get("queryVector") or {}
+    if isinstance(query.get("float32"), np.ndarray):
+        arrays[("queryVector",)] = query["float32"]
+        params["queryVector"] = {**query, "float32": [0.0]}
+    vectors = params.get("vectors")
+    fragments = getattr(vectors, "fragments", None)
+    if fragments is not None:
+        context[_FRAGMENTS_CONTEXT_KEY] = fragments
+    if vectors:
+        stubbed = []
+        for i, vector in enumerate(vectors):
+            data = vector.get("data") or {}
+            arr = data.get("float32")
+            if isinstance(arr, np.ndarray):
+                if fragments is None:
+                    arrays[("vectors", i, "data")] = arr
+                vector = {**vector, "data": {**data, "float32": [0.0]}}
+            stubbed.append(vector)
+        params["vectors"] = stubbed
+    if arrays:
+        context[_ARRAYS_CONTEXT_KEY] = arrays
+
+
+def _splice_vector_arrays(params, context, **kwargs) -> None:
+    arrays = context.pop(_ARRAYS_CONTEXT_KEY, None)
+    fragments = context.pop(_FRAGMENTS_CONTEXT_KEY, None)
+    if not arrays and fragments is None:
+        return
+    body = orjson.loads(params["body"])
+    for path, arr in (arrays or {}).items():
+        node = body
+        for key in path:
+            node = node[key]
+        node["float32"] = arr
+    if fragments is None:
+        params["body"] = orjson.dumps(body, option=orjson.OPT_SERIALIZE_NUMPY)
+        return
+    # Re-encode only the small constant part botocore built (bucket/index names)
+    # and splice the pre-encoded vectors in as the "vectors" array.
+    del body["vectors"]
+    head = orjson.dumps(body)[:-1]
+    head += (b"," if len(head) > 1 else b"") + b'"vectors":['
+    size = len(head) + sum(len(fragment) + 1 for fragment in fragments) + 1
+    if size <= _BODY_FILE_THRESHOLD:
+        params["body"] = head + b",".join(fragments) + b"]}"
+        return
+    # Large bodies go straight to disk instead of being joined into one more
+    # in-memory copy; _close_body_file closes the file once the call finishes.
+    body_file = tempfile.TemporaryFile()
+    body_file.write(head)
+    for i, fragment in enumerate(fragments):
+        if i:
+            body_file.write(b",")
+        body_file.write(fragment)
+    body_file.write(b"]}")
+    body_file.seek(0)
+    params["body"] = body_file
+    context[_BODY_FILE_CONTEXT_KEY] = body_file
+
+
+def _close_body_file(context, **kwargs) -> None:
+    body_file = context.pop(_BODY_FILE_CONTEXT_KEY, None)
+    if body_file is not None:
+        body_file.close()
+
+
+def register_numpy_serializer(s3v) -> None:
+    """Let put_vectors and query_vectors accept float32 ndarrays and encode them with orjson.
+
+    orjson reads the array buffer directly, so vectors never get boxed into
+    Python floats and are written with their shortest float32 repr.
+    """
+    events = s3v.meta.events
+    for operation in ("PutVectors", "QueryVectors"):
+        events.register(f"before-parameter-build.s3vectors.{operation}", _stash_vector_arrays)
+        events.register(f"before-call.s3vectors.{operation}", _splice_vector_arrays)
+    events.register("after-call.s3vectors.PutVectors", _close_body_file)
+    events.register("after-call-error.s3vectors.PutVectors", _close_body_file)
+
+
+class _RestJSONParser(RestJSONParser):
+    def _parse_body_as_json(self, body_contents):
+        if not body_contents:
+            return {}
+        try:
+            return orjson.loads(body_contents)
+        except orjson.JSONDecodeError:
+            # Fall back to botocore for its handling of non-JSON (error) bodies.
+            return super()._parse_body_as_json(body_contents)
+
+    def _parse_shape(self, shape, node):
+        if shape is not None and shape.name in _RAW_OUTPUT_SHAPES:
+            return node
+        return super()._parse_shape(shape, node)
+
+
+class _ResponseParserFactory(ResponseParserFactory):
+    def create_parser(self, protocol_name):
+        if protocol_name == "rest-json":
+            return _RestJSONParser(**self._defaults)
+        return super().create_parser(protocol_name)
+
+
+@functools.lru_cache(maxsize=None)
+def get_session() -> boto3.Session:
+    """Return the process-wide boto3 session, with the orjson-backed response parser installed."""
+    core = botocore.session.get_session()
+    core.register_component("response_parser_factory", _ResponseParserFactory())
+    return boto3.Session(botocore_session=core)
+
+
+# The s3vectors scripts import this module inside main(), so importing a script
+# does not load numpy/boto3; everything cached below lives for the process.
+@functools.lru_cache(maxsize=None)
+def get_rng() -> np.random.Generator:
+    """Return the process-wide random generator, seeded once from the clock."""
+    return np.random.default_rng(seed=int(time.time()))
+
+
+def supported_data_types(s3v) -> list[str]:
+    """Return the create_index dataType values the installed botocore model accepts (e.g. ["float32"])."""
+    return list(s3v.meta.service_model.operation_model("CreateIndex").input_shape.members["dataType"].enum)
+
+
+@functools.lru_cache(maxsize=4)
+def get_client(service: str, region: str):
+    """Return a cached client; loading the service model is the expensive part of creating one."""
+    client = get_session().client(service, region_name=region, config=_CLIENT_CONFIG)
+    if service == "s3vectors":
+        register_numpy_serializer(client)
+    return client
+
+
+class _RateGate:
+    """Spaces calls at least 1/rate seconds apart, across threads."""
+
+    def __init__(self, rate: float) -> None:
+        self._interval = 1.0 / rate
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self._interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _run_concurrently(call, items, workers: int, rate: float) -> list:
+    # Keep at most 2 * workers calls in flight so a large generator is never
+    # fully materialized; results come back in submission order.
+    gate = _RateGate(rate)
+
+    def gated(item):
+        gate.wait()
+        return call(item)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(gated, item))
+            if len(pending) >= 2 * workers:
+                results.append(pending.popleft().result())
+        results.extend(future.result() for future in pending)
+    return results
+
+
+def _put_batches(vectors, max_batch: int, max_bytes: int):
+    # Each vector is encoded once here: the size drives batching and the bytes
+    # are reused verbatim as the request body.
+    batch = []
+    fragments = []
+    batch_bytes = 0
+    for vector in vectors:
+        fragment = orjson.dumps(vector, option=orjson.OPT_SERIALIZE_NUMPY)
+        if batch and (len(batch) >= max_batch or batch_bytes + len(fragment) > max_bytes):
+            yield _EncodedVectors(batch, fragments)
+            batch = []
+            fragments = []
+            batch_bytes = 0
+        batch.append(vector)
+        fragments.append(fragment)
+        batch_bytes += len(fragment)
+    if batch:
+        yield _EncodedVectors(batch, fragments)
+
+
+def bulk_put(
+    s3v,
+    bucket: str,
+    index: str,
+    vectors,
+    max_batch: int = 500,
+    max_bytes: int = 4_000_000,
+    workers: int = 8,
+    rate: float = 100.0,
+) -> list:
+    """Insert vectors from any iterable using as few put_vectors calls as possible.
+
+    A batch is flushed once it reaches max_batch vectors (the service limit) or
+    its encoded size would exceed max_bytes; raise max_bytes past 4 MiB to have
+    large bodies streamed from a temp file. Batches are sent from `workers`
+    threads, at most `rate` calls per second. Returns one response per call.
+    """
+    return _run_concurrently(
+        lambda batch: s3v.put_vectors(vectorBucketName=bucket, indexName=index, vectors=batch),
+        _put_batches(vectors, max_batch, max_bytes),
+        workers,
+        rate,
+    )
+
+
+def bulk_delete(
+    s3v,
+    bucket: str,
+    index: str,
+    keys,
+    chunk: int = 500,
+    workers: int = 8,
+    rate: float = 100.0,
+) -> list:
+    """Delete keys in chunks of up to `chunk` (the service limit), sent like bulk_put."""
+    keys = list(keys)
+    return _run_concurrently(
+        lambda batch: s3v.delete_vectors(vectorBucketName=bucket, indexName=index, keys=batch),
+        (keys[i : i + chunk] for i in range(0, len(keys), chunk)),
+        workers,
+        rate,
+    )
+
+
+def _error_code(e: ClientError) -> str:
+    return (e.response or {}).get("Error", {}).get("Code", "")
+
+
+def _listed(s3v, operation: str, list_key: str, name_key: str, name: str, **kwargs) -> bool:
+    # Filter server-side by prefix, then match the exact name locally; stop at the
+    # first page that contains it.
+    try:
+        for page in s3v.get_paginator(operation).paginate(prefix=name, **kwargs):
+            if any(item.get(name_key) == name for item in page.get(list_key) or []):
+                return True
+    except ClientError as e:
+        if _error_code(e) in _NOT_FOUND_CODES:
+            return False
+        raise
+    return False
+
+
+def _exists(call, **kwargs) -> bool:
+    try:
+        call(**kwargs)
+    except ClientError as e:
+        if _error_code(e) in _NOT_FOUND_CODES:
+            return False
+        raise
+    return True
+
+
+def _bucket_exists(s3v, bucket: str) -> bool:
+    try:
+        return _listed(s3v, "list_vector_buckets", "vectorBuckets", "vectorBucketName", bucket)
+    except ClientError as e:
+        # ListVectorBuckets cannot be scoped to one bucket ARN, so identities
+        # limited to their own bucket fall back to the per-bucket Get call.
+        if _error_code(e) != "AccessDeniedException":
+            raise
+    return _exists(s3v.get_vector_bucket, vectorBucketName=bucket)
+
+
+def _index_exists(s3v, bucket: str, index: str) -> bool:
+    try:
+        return _listed(s3v, "list_indexes", "indexes", "indexName", index, vectorBucketName=bucket)
+    except ClientError as e:
+        if _error_code(e) != "AccessDeniedException":
+            raise
+    return _exists(s3v.get_index, vectorBucketName=bucket, indexName=index)
+
+
+def check_bucket_and_index(s3v, bucket: str, index: str) -> tuple[bool, bool]:
+    """Look up the vector bucket and index concurrently with prefix-filtered list calls.
+
+    Falls back to get_vector_bucket/get_index when the list call is denied.
+    Returns (bucket_exists, index_exists); a missing resource is a plain False
+    rather than a NotFound error. Any other error is raised.
+    """
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        bucket_future = pool.submit(_bucket_exists, s3v, bucket)
+        index_future = pool.submit(_index_exists, s3v, bucket, index)
+        return bucket_future.result(), index_future.result()
@@ -1,10 +1,18 @@
 import os
-import time
-import uuid
-
-import boto3
-import numpy as np
-from botocore.exceptions import BotoCoreError, ClientError, UnknownServiceError
+import secrets
+import sys
+
+_CONFIG_TEMPLATE = (
+    "Config\n"
+    "Bucket: %s\n"
+    "Index: %s\n"
+    "Region: %s\n"
+    "Dimension: %d\n"
+    "Metric: %s\n"
+    "DataType: %s\n"
+    "K: %d\n"
+    "\n"
+)
 
 
 def _require_env(name: str) -> str:
@@ -20,6 +28,20 @@ def _env_int(name: str, default: int) -> int:
 
 
 def main() -> None:
+    import numpy as np
+    import orjson
+    from botocore.exceptions import UnknownServiceError
+
+    from s3v_utils import (
+        bulk_delete,
+        bulk_put,
+        check_bucket_and_index,
+        get_client,
+        get_rng,
+        get_session,
+        supported_data_types,
+    )
+
     bucket = _require_env("S3V_BUCKET")
     index = _require_env("S3V_INDEX")
     dimension = _env_int("S3V_DIMENSION", 1536)
@@ -27,88 +49,77 @@ def main() -> None:
     data_type = os.getenv("S3V_DATA_TYPE", "float32")
     k = _env_int("S3V_K", 20)
 
-    session = boto3.Session()
+    session = get_session()
     region = session.region_name or os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "us-east-1"
 
     try:
-        s3v = session.client("s3vectors", region_name=region)
+        s3v = get_client("s3vectors", region)
     except UnknownServiceError as e:
         raise SystemExit(
             "boto3/botocore does not recognize 's3vectors' yet. "
             "Upgrade boto3/botocore to a version that includes Amazon S3 Vectors."
         ) from e
 
-    print("Config")
-    print(f"Bucket: {bucket}")
-    print(f"Index: {index}")
-    print(f"Region: {region}")
-    print(f"Dimension: {dimension}")
-    print(f"Metric: {metric}")
-    print(f"DataType: {data_type}")
-    print(f"K: {k}")
-    print("")
+    data_types = supported_data_types(s3v)
+    if data_type not in data_types:
+        raise SystemExit(
+            f"Unsupported S3V_DATA_TYPE {data_type!r}; this botocore model accepts: {', '.join(data_types)}"
+        )
+
+    sys.stdout.write(_CONFIG_TEMPLATE % (bucket, index, region, dimension, metric, data_type, k))
+    sys.stdout.flush()
+
+    bucket_exists, index_exists = check_bucket_and_index(s3v, bucket, index)
 
     print("0) ensure vector bucket")
-    try:
-        s3v.get_vector_bucket(vectorBucketName=bucket)
+    if bucket_exists:
         print("Vector bucket exists; continuing.")
-    except ClientError as e:
-        code = (e.response or {}).get("Error", {}).get("Code", "")
-        if code in {"NotFoundException", "ResourceNotFoundException", "NoSuchBucket"}:
-            res = s3v.create_vector_bucket(vectorBucketName=bucket)
-            print("Created vector bucket:", res)
-        else:
-            raise
+    else:
+        res = s3v.create_vector_bucket(vectorBucketName=bucket)
+        print("Created vector bucket:", res)
 
     print("")
     print("1) ensure index")
-    try:
-        s3v.get_index(vectorBucketName=bucket, indexName=index)
+    if index_exists:
         print("Index exists; continuing.")
-    except ClientError as e:
-        code = (e.response or {}).get("Error", {}).get("Code", "")
-        if code in {"NotFoundException", "ResourceNotFoundException"}:
-            res = s3v.create_index(
-                vectorBucketName=bucket,
-                indexName=index,
-                dataType=data_type,
-                dimension=dimension,
-                distanceMetric=metric,
-            )
-            print("Created index:", res)
-        else:
-            raise
-
-    rng = np.random.default_rng(seed=int(time.time()))
-    suffix = uuid.uuid4().hex[:8]
-    vectors = [
-        {
-            "key": f"hybrid-apples-nl-{suffix}",
-            "data": {"float32": rng.random(dimension, dtype=np.float32).tolist()},
-            "metadata": {"category": "apples", "origin": "NL"},
-        },
-        {
-            "key": f"hybrid-apples-de-{suffix}",
-            "data": {"float32": rng.random(dimension, dtype=np.float32).tolist()},
-            "metadata": {"category": "apples", "origin": "DE"},
-        },
-        {
-            "key": f"hybrid-bananas-ec-{suffix}",
-            "data": {"float32": rng.random(dimension, dtype=np.float32).tolist()},
-            "metadata": {"category": "bananas", "origin": "EC"},
-        },
+    else:
+        res = s3v.create_index(
+            vectorBucketName=bucket,
+            indexName=index,
+            dataType=data_type,
+            dimension=dimension,
+            distanceMetric=metric,
+        )
+        print("Created index:", res)
+
+    suffix = secrets.token_hex(4)
+    keys = [
+        f"hybrid-apples-nl-{suffix}",
+        f"hybrid-apples-de-{suffix}",
+        f"hybrid-bananas-ec-{suffix}",
+    ]
+    metadata = [
+        {"category": "apples", "origin": "NL"},
+        {"category": "apples", "origin": "DE"},
+        {"category": "bananas", "origin": "EC"},
     ]
+    # Rows 0..N-1 are the stored vectors, row N is the query vector.
+    mat = np.empty((len(keys) + 1, dimension), dtype=np.float32)
+    get_rng().random(out=mat, dtype=np.float32)
+    vectors = (
+        {"key": key, "data": {"float32": mat[i]}, "metadata": meta}
+        for i, (key, meta) in enumerate(zip(keys, metadata))
+    )
 
-    keys = [v["key"] for v in vectors]
     try:
         print("")
         print("2) put_vectors (category/origin metadata)")
-        s3v.put_vectors(vectorBucketName=bucket, indexName=index, vectors=vectors)
+        bulk_put(s3v, bucket, index, vectors)
         print("Inserted keys:", keys)
 
         print("")
         print("3) query_vectors (vector + metadata filter)")
-        query = rng.random(dimension, dtype=np.float32).tolist()
+        query = mat[-1]
         query_filter = {
             "$and": [
                 {"category": {"$eq": "apples"}},
@@ -125,15 +136,17 @@ def main() -> None:
             returnDistance=True,
         )
         print("Filter:", query_filter)
-        print("Results:", res)
+        print("Results:", orjson.dumps(res).decode())
     finally:
         print("")
         print("4) delete_vectors (cleanup)")
-        s3v.delete_vectors(vectorBucketName=bucket, indexName=index, keys=keys)
+        bulk_delete(s3v, bucket, index, keys)
         print("Deleted keys:", keys)
 
 
 if __name__ == "__main__":
+    from botocore.exceptions import BotoCoreError, ClientError
+
     try:
         main()
     except (BotoCoreError, ClientError) as e:
@@ -1,11 +1,18 @@
 import os
-import json
-import time
-import uuid
-
-import boto3
-import numpy as np
-from botocore.exceptions import BotoCoreError, ClientError, UnknownServiceError
+import secrets
+import sys
+
+_CONFIG_TEMPLATE = (
+    "Config\n"
+    "Bucket: %s\n"
+    "Index: %s\n"
+    "Region: %s\n"
+    "Dimension: %d\n"
+    "Metric: %s\n"
+    "DataType: %s\n"
+    "Type: %s\n"
+    "K: %d\n"
+)
 
 
 def _require_env(name: str) -> str:
@@ -21,6 +28,20 @@ def _env_int(name: str, default: int) -> int:
 
 
 def main() -> None:
+    import numpy as np
+    import orjson
+    from botocore.exceptions import BotoCoreError, ClientError, UnknownServiceError
+
+    from s3v_utils import (
+        bulk_delete,
+        bulk_put,
+        check_bucket_and_index,
+        get_client,
+        get_rng,
+        get_session,
+        supported_data_types,
+    )
+
     bucket = _require_env("S3V_BUCKET")
     index = _require_env("S3V_INDEX")
     dimension = _env_int("S3V_DIMENSION", 1536)
@@ -30,77 +51,81 @@ def main() -> None:
     k = _env_int("S3V_K", 5)
     filter_kind = os.getenv("S3V_FILTER_KIND")
     filter_json = (os.getenv("S3V_FILTER_JSON") or "").strip()
+    try:
+        query_filter = orjson.loads(filter_json) if filter_json else None
+    except orjson.JSONDecodeError as e:
+        raise SystemExit(f"Invalid JSON in S3V_FILTER_JSON: {e}") from e
     cleanup = (os.getenv("S3V_CLEANUP") or "").strip().lower() in {"1", "true", "yes"}
     min_similarity = os.getenv("S3V_MIN_SIMILARITY")
     min_similarity_f = float(min_similarity) if min_similarity else None
 
-    session = boto3.Session()
+    session = get_session()
     region = session.region_name or os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "us-east-1"
 
     try:
-        s3v = session.client("s3vectors", region_name=region)
+        s3v = get_client("s3vectors", region)
     except UnknownServiceError as e:
         raise SystemExit(
             "boto3/botocore does not recognize 's3vectors' yet. "
             "Upgrade boto3/botocore to a version that includes Amazon S3 Vectors."
         ) from e
 
-    print("Config")
-    print(f"Bucket: {bucket}")
-    print(f"Index: {index}")
-    print(f"Region: {region}")
-    print(f"Dimension: {dimension}")
-    print(f"Metric: {metric}")
-    print(f"DataType: {data_type}")
-    print(f"Type: {index_type}")
-    print(f"K: {k}")
+    data_types = supported_data_types(s3v)
+    if data_type not in data_types:
+        raise SystemExit(
+            f"Unsupported S3V_DATA_TYPE {data_type!r}; this botocore model accepts: {', '.join(data_types)}"
+        )
+
+    out = _CONFIG_TEMPLATE % (bucket, index, region, dimension, metric, data_type, index_type, k)
     if filter_kind:
-        print(f"Filter kind: {filter_kind}")
+        out += "Filter kind: %s\n" % filter_kind
     if filter_json:
-        print(f"Filter JSON: {filter_json}")
+        out += "Filter JSON: %s\n" % filter_json
     if min_similarity_f is not None:
-        print(f"Min similarity: {min_similarity_f}")
-    print(f"Cleanup: {cleanup}")
-    print("")
+        out += "Min similarity: %s\n" % min_similarity_f
+    out += "Cleanup: %s\n\n" % cleanup
+    sys.stdout.write(out)
+    sys.stdout.flush()
+
+    bucket_exists, index_exists = check_bucket_and_index(s3v, bucket, index)
 
     print("0) ensure vector bucket")
-    try:
-        s3v.get_vector_bucket(vectorBucketName=bucket)
+    if bucket_exists:
         print("Vector bucket exists; continuing.")
-    except ClientError as e:
-        code = (e.response or {}).get("Error", {}).get("Code", "")
-        if code in {"NotFoundException", "ResourceNotFoundException", "NoSuchBucket"}:
-            res = s3v.create_vector_bucket(vectorBucketName=bucket)
-            print("Created vector bucket:", res)
-        else:
-            raise
+    else:
+        res = s3v.create_vector_bucket(vectorBucketName=bucket)
+        print("Created vector bucket:", res)
 
     print("")
     print("1) create_index")
-    try:
-        res = s3v.create_index(
-            vectorBucketName=bucket,
-            indexName=index,
-            dataType=data_type,
-            dimension=dimension,
-            distanceMetric=metric,
-        )
-        print("Created:", res)
-    except ClientError as e:
-        code = (e.response or {}).get("Error", {}).get("Code", "")
-        if code.lower() in {"resourcealreadyexistsexception", "conflictexception", "alreadyexists"}:
-            print("Already exists; continuing.")
-        else:
+    if index_exists:
+        print("Already exists; continuing.")
+    else:
+        try:
+            res = s3v.create_index(
+                vectorBucketName=bucket,
+                indexName=index,
+                dataType=data_type,
+                dimension=dimension,
+                distanceMetric=metric,
+            )
+            print("Created:", res)
+        except ClientError as e:
+            code = (e.response or {}).get("Error", {}).get("Code", "")
+            if code.lower() in {"resourcealreadyexistsexception", "conflictexception", "alreadyexists"}:
+                print("Already exists; continuing.")
+            else:
+                raise
+        except BotoCoreError:
             raise
-    except BotoCoreError:
-        raise
 
     print("")
     print("2) put_vectors")
-    rng = np.random.default_rng(seed=int(time.time()))
-    v1 = rng.random(dimension, dtype=np.float32).tolist()
-    v2 = rng.random(dimension, dtype=np.float32).tolist()
-    suffix = uuid.uuid4().hex[:8]
+    # Rows 0-1 are the stored vectors, row 2 is the query vector.
+    mat = np.empty((3, dimension), dtype=np.float32)
+    get_rng().random(out=mat, dtype=np.float32)
+    v1, v2, query = mat
+    suffix = secrets.token_hex(4)
     items = [
         {
             "key": f"smoke-1-{suffix}",
@@ -114,12 +139,11 @@ def main() -> None:
         },
     ]
 
-    res = s3v.put_vectors(vectorBucketName=bucket, indexName=index, vectors=items)
-    print("Put:", res)
+    for res in bulk_put(s3v, bucket, index, items):
+        print("Put:", res)
 
     print("")
     print("3) query_vectors")
-    query = rng.random(dimension, dtype=np.float32).tolist()
     query_args = dict(
         vectorBucketName=bucket,
         indexName=index,
@@ -128,11 +152,8 @@ def main() -> None:
         returnMetadata=True,
         returnDistance=True,
     )
-    if filter_json:
-        try:
-            query_args["filter"] = json.loads(filter_json)
-        except json.JSONDecodeError as e:
-            raise SystemExit(f"Invalid JSON in S3V_FILTER_JSON: {e}") from e
+    if query_filter is not None:
+        query_args["filter"] = query_filter
     elif filter_kind:
         query_args["filter"] = {"kind": filter_kind}
 
@@ -141,17 +162,16 @@ def main() -> None:
     if min_similarity_f is not None:
         if res.get("distanceMetric") != "cosine":
             raise SystemExit("S3V_MIN_SIMILARITY currently only supported when distanceMetric=cosine")
-        vectors = [v for v in vectors if (1.0 - float(v.get("distance"))) >= min_similarity_f]
+        distances = np.fromiter((v["distance"] for v in vectors), dtype=np.float64, count=len(vectors))
+        keep = (1.0 - distances) >= min_similarity_f
+        vectors = [v for v, kept in zip(vectors, keep.tolist()) if kept]
         res = dict(res)
         res["vectors"] = vectors
-    print("Query:", res)
+    print("Query:", orjson.dumps(res).decode())
 
     if filter_kind:
-        bad = [
-            v.get("key")
-            for v in (res.get("vectors") or [])
-            if (v.get("metadata") or {}).get("kind") != filter_kind
-        ]
+        # `vectors` already mirrors res["vectors"] (post min-similarity filter).
+        bad = [v.get("key") for v in vectors if (v.get("metadata") or {}).get("kind") != filter_kind]
         if bad:
             raise SystemExit(f"Filter validation failed; non-matching vectors returned: {bad}")
 
@@ -159,8 +179,8 @@ def main() -> None:
         print("")
         print("4) delete_vectors (cleanup)")
         keys = [v["key"] for v in items]
-        res = s3v.delete_vectors(vectorBucketName=bucket, indexName=index, keys=keys)
-        print("Deleted:", res)
+        for res in bulk_delete(s3v, bucket, index, keys):
+            print("Deleted:", res)
 
 
 if __name__ == "__main__":